@@ -1,7 +1,10 @@
 import asyncio
+import functools
+import logging
 from dotenv import load_dotenv
 import random
-from datetime import datetime, timedelta
+import re
+from datetime import date, datetime, time, timedelta
 from typing import Any
 from google.genai import types
 
@@ -15,10 +18,9 @@ from livekit.plugins import (
 
 load_dotenv(".env.local")
 
+logger = logging.getLogger(__name__)
 
-class FlightBookingAgent(Agent):
-    def __init__(self, chat_ctx: ChatContext  | None = None) -> None:
-        super().__init__(instructions="""You are a helpful flight booking AI assistant. You can help users book flights and also transfer them to hotel booking if needed.
+_FLIGHT_INSTRUCTIONS = """You are a helpful flight booking AI assistant. You can help users book flights and also transfer them to hotel booking if needed.
 
 If a user asks a question about flights, airlines, airports, travel policies, or need general information, use the search_knowledge_base tool to search the knowledge base and provide the information.
 
@@ -27,7 +29,123 @@ When a user wants to book a flight, ask them for:
 2. Destination city/airport (destination) 
 3. Travel date
 
-Then use the book_flight tool to complete their booking. If they also need hotel booking, use the transfer_to_hotel_booking tool. Be friendly, professional, and helpful.""", chat_ctx=chat_ctx if chat_ctx else NOT_GIVEN)
+Then use the book_flight tool to complete their booking. If they also need hotel booking, use the transfer_to_hotel_booking tool. Be friendly, professional, and helpful."""
+
+_HOTEL_INSTRUCTIONS = """You are a helpful hotel booking AI assistant. You can help users book hotels for their travel.
+        
+When a user wants to book a hotel, ask them for:
+1. City/location where they need the hotel
+2. Check-in date
+3. Check-out date
+4. Number of guests
+5. Room preferences (optional)
+
+Then use the book_hotel tool to complete their booking. Be friendly, professional, and helpful."""
+
+# Static information about flight policy returned by the knowledge base search
+_POLICY_INFO = (
+    "Flight Policy Info: Changes are allowed up to 24 hours before departure with a fee. "
+    "Baggage allowance: 1 checked bag (23kg) and 1 cabin bag per passenger. "
+    "For international flights, please arrive 2 hours before your scheduled departure."
+)
+
+# Module-local generator for booking details
+_RNG = random.Random()
+
+# Every seat ("A1" .. "F30") and quarter-hour departure minute a booking can get
+_SEATS = tuple(f"{letter}{row}" for letter in "ABCDEF" for row in range(1, 31))
+_MINUTES = (0, 15, 30, 45)
+
+# Date formats accepted by book_flight, tried in order
+_DATE_FORMATS: tuple[str, ...] = (
+    "%d %b %Y",      # "18 dec 2025"
+    "%b %d %Y",      # "dec 18 2025"
+    "%d %B %Y",      # "18 december 2025"
+    "%B %d %Y",      # "december 18 2025"
+    "%Y-%m-%d",      # "2025-12-18"
+    "%m/%d/%Y",      # "12/18/2025"
+    "%d/%m/%Y",      # "18/12/2025"
+)
+
+# Relative date keywords and their day offset from today, checked in order
+_KEYWORD_DAYS = {"tomorrow": 1, "today": 0, "next week": 7}
+
+# Departure/arrival formats for the debug log and the tool result
+_LOG_TIME_FORMAT = "%Y-%m-%d %H:%M"
+_DISPLAY_TIME_FORMAT = "%B %d, %Y at %I:%M %p"
+
+# Ordinal suffixes following a day number, e.g. the "th" in "18th"
+_ORDINAL_RE = re.compile(r"(?<=\d)(st|nd|rd|th)\b")
+
+# Strict ISO date, e.g. "2025-12-18"
+_ISO_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+# Travel date keywords recognised in the chat history
+_DATE_KEYWORDS = (
+    "tomorrow", "today", "next week",
+    "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december",
+)
+
+# Destination ("to <word>") or travel date keyword mentioned in a chat message
+_CTX_RE = re.compile(
+    r"\bto\s+(\w+)|\b(" + "|".join(map(re.escape, _DATE_KEYWORDS)) + r")\b",
+    re.I,
+)
+
+
+@functools.lru_cache(maxsize=128)
+def _format_search_result(query: str) -> str:
+    """Format the knowledge base search result for a query."""
+    return f'Searching the knowledge base for "{query}"...\n\n{_POLICY_INFO}'
+
+
+def _today() -> datetime:
+    """Return midnight of the current local date."""
+    return datetime.combine(date.today(), time.min)
+
+
+@functools.lru_cache(maxsize=512)
+def _parse_date_cached(date_lower: str) -> datetime | None:
+    """Parse a lowercased date string with the first matching format, or return None."""
+    # Handle formats like "18th Dec 2025", "Dec 18 2025", "18 Dec 2025"
+    date_clean = _ORDINAL_RE.sub("", date_lower)
+
+    # Fast path for ISO dates, built directly instead of going through strptime
+    if _ISO_RE.fullmatch(date_clean):
+        try:
+            return datetime(int(date_clean[:4]), int(date_clean[5:7]), int(date_clean[8:10]))
+        except ValueError:
+            return None
+
+    # Fast path for "12/18/2025" (month first) and "18/12/2025" (day first)
+    parts = date_clean.split("/")
+    if (
+        len(parts) == 3
+        and all(part.isdigit() for part in parts)
+        and len(parts[0]) <= 2
+        and len(parts[1]) <= 2
+        and len(parts[2]) == 4
+    ):
+        first, second, year = int(parts[0]), int(parts[1]), int(parts[2])
+        for month, day in ((first, second), (second, first)):
+            try:
+                return datetime(year, month, day)
+            except ValueError:
+                continue
+        return None
+
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(date_clean, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+class FlightBookingAgent(Agent):
+    def __init__(self, chat_ctx: ChatContext  | None = None) -> None:
+        super().__init__(instructions=_FLIGHT_INSTRUCTIONS, chat_ctx=chat_ctx if chat_ctx else NOT_GIVEN)
     
 
     async def _perform_search(self, query: str) -> str:
@@ -35,16 +153,7 @@ Then use the book_flight tool to complete their booking. If they also need hotel
         
         # Simulate a delay to represent actual searching
         await asyncio.sleep(2.0)
-        # Provide some static information about flight policy
-        policy_info = (
-            "Flight Policy Info: Changes are allowed up to 24 hours before departure with a fee. "
-            "Baggage allowance: 1 checked bag (23kg) and 1 cabin bag per passenger. "
-            "For international flights, please arrive 2 hours before your scheduled departure."
-        )
-        return (
-            f"Searching the knowledge base for \"{query}\"...\n\n"
-            f"{policy_info}"
-        )
+        return _format_search_result(query)
 
 
     @function_tool()
@@ -60,22 +169,23 @@ Then use the book_flight tool to complete their booking. If they also need hotel
             query: The query to search the knowledge base for
         """
         
-        async def _speak_status_update(delay: float = 0.5):
-            await asyncio.sleep(delay)
-            await context.session.generate_reply(instructions=f"""
-                You are searching the knowledge base for \"{query}\" but it is taking a little while.
-                Update the user on your progress, but be very brief.
-            """)
-        
-        status_update_task = asyncio.create_task(_speak_status_update(2))
-
         # Perform search (function definition omitted for brevity)
-        result = await self._perform_search(query)
+        search_task = asyncio.create_task(self._perform_search(query))
         
-        # Cancel status update if search completed before timeout
-        status_update_task.cancel()
-    
-        return result
+        try:
+            # Give the search a head start; if it has not finished by then, update the user
+            done, _ = await asyncio.wait({search_task}, timeout=2.0)
+            if not done:
+                context.session.generate_reply(instructions=f"""
+                    You are searching the knowledge base for \"{query}\" but it is taking a little while.
+                    Update the user on your progress, but be very brief.
+                """)
+            
+            return await search_task
+        except asyncio.CancelledError:
+            # Don't leave the search running if the tool call itself is cancelled
+            search_task.cancel()
+            raise
 
     @function_tool()
     async def book_flight(
@@ -92,81 +202,72 @@ Then use the book_flight tool to complete their booking. If they also need hotel
             destination: Arrival city/airport (e.g., 'Los Angeles', 'JFK', 'Paris')
             date: Travel date (e.g., 'January 15, 2025', '2025-01-15', 'tomorrow')
         """
+        # Draw every random field from a single 64-bit sample, peeling each one
+        # off as a mixed-radix digit (the modulo bias is negligible at 64 bits)
+        bits = _RNG.getrandbits(64)
+        bits, flight_offset = divmod(bits, 9000)
+        bits, fallback_offset = divmod(bits, 30)
+        bits, hour_offset = divmod(bits, 17)
+        bits, minute_index = divmod(bits, len(_MINUTES))
+        bits, duration_offset = divmod(bits, 7)
+        bits, price_offset = divmod(bits, 801)
+        bits, seat_index = divmod(bits, len(_SEATS))
+
         # Generate simple flight details
-        flight_number = f"FL{random.randint(1000, 9999)}"
-        
-        # Convert the date string to a departure date
-        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        flight_number = f"FL{1000 + flight_offset}"
         
-        if "tomorrow" in date.lower():
-            departure_date = today + timedelta(days=1)
-        elif "today" in date.lower():
-            departure_date = today
-        elif "next week" in date.lower():
-            departure_date = today + timedelta(days=7)
+        # Convert the date string to a departure date; today's date is only
+        # looked up for relative keywords and the fallback
+        date_lower = date.lower()
+        offset = next((days for keyword, days in _KEYWORD_DAYS.items() if keyword in date_lower), None)
+        if offset is not None:
+            departure_date = _today() + timedelta(days=offset)
         else:
             # Try to parse specific dates
             try:
-                # Handle formats like "18th Dec 2025", "Dec 18 2025", "18 Dec 2025"
-                date_clean = date.lower().replace("st", "").replace("nd", "").replace("rd", "").replace("th", "")
-                
-                # Try different date formats
-                formats = [
-                    "%d %b %Y",      # "18 dec 2025"
-                    "%b %d %Y",      # "dec 18 2025" 
-                    "%d %B %Y",      # "18 december 2025"
-                    "%B %d %Y",      # "december 18 2025"
-                    "%Y-%m-%d",      # "2025-12-18"
-                    "%m/%d/%Y",      # "12/18/2025"
-                    "%d/%m/%Y",      # "18/12/2025"
-                ]
-                
-                departure_date = None
-                for fmt in formats:
-                    try:
-                        departure_date = datetime.strptime(date_clean, fmt)
-                        break
-                    except ValueError:
-                        continue
+                departure_date = _parse_date_cached(date_lower)
                 
                 # If parsing failed, use fallback
                 if departure_date is None:
-                    departure_date = today + timedelta(days=random.randint(1, 30))
+                    departure_date = _today() + timedelta(days=1 + fallback_offset)
                     
             except Exception:
                 # If anything goes wrong, use fallback
-                departure_date = today + timedelta(days=random.randint(1, 30))
-        departure_hour = random.randint(6, 22)  # Random hour between 6 AM and 10 PM
-        departure_minute = random.choice([0, 15, 30, 45])  # Quarter hour intervals
+                departure_date = _today() + timedelta(days=1 + fallback_offset)
+        departure_hour = 6 + hour_offset  # Random hour between 6 AM and 10 PM
+        departure_minute = _MINUTES[minute_index]  # Quarter hour intervals
         departure_time = departure_date.replace(hour=departure_hour, minute=departure_minute, second=0, microsecond=0)
         
         # Add random flight duration (2-8 hours)
-        flight_duration = timedelta(hours=random.randint(2, 8))
+        flight_duration = timedelta(hours=2 + duration_offset)
         arrival_time = departure_time + flight_duration
         
-        price = random.randint(200, 1000)
-        seat = f"{random.choice(['A', 'B', 'C', 'D', 'E', 'F'])}{random.randint(1, 30)}"
+        price = 200 + price_offset
+        seat = _SEATS[seat_index]
+        route = f"{source.upper()} → {destination.upper()}"
         
-        # Print booking details to console
-        print(f"🛫 FLIGHT BOOKING CONFIRMED!")
-        print(f"   Flight: {flight_number}")
-        print(f"   Route: {source.upper()} → {destination.upper()}")
-        print(f"   Date: {date}")
-        print(f"   Departure: {departure_time.strftime('%Y-%m-%d %H:%M')}")
-        print(f"   Arrival: {arrival_time.strftime('%Y-%m-%d %H:%M')}")
-        print(f"   Price: ${price}")
-        print(f"   Seat: {seat}")
-        print(f"   Status: CONFIRMED ✅")
-        print("-" * 50)
+        # Log booking details when debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("\n".join([
+                "🛫 FLIGHT BOOKING CONFIRMED!",
+                f"   Flight: {flight_number}",
+                f"   Route: {route}",
+                f"   Date: {date}",
+                f"   Departure: {departure_time.strftime(_LOG_TIME_FORMAT)}",
+                f"   Arrival: {arrival_time.strftime(_LOG_TIME_FORMAT)}",
+                f"   Price: ${price}",
+                f"   Seat: {seat}",
+                "   Status: CONFIRMED ✅",
+            ]))
         
         # Return structured data
         return {
             "status": "confirmed",
             "flight_number": flight_number,
-            "route": f"{source.upper()} → {destination.upper()}",
+            "route": route,
             "date": date,
-            "departure": departure_time.strftime('%B %d, %Y at %I:%M %p'),
-            "arrival": arrival_time.strftime('%B %d, %Y at %I:%M %p'),
+            "departure": departure_time.strftime(_DISPLAY_TIME_FORMAT),
+            "arrival": arrival_time.strftime(_DISPLAY_TIME_FORMAT),
             "price": f"${price}",
             "seat": seat,
             "message": f"Flight {flight_number} from {source} to {destination} on {date} has been successfully booked!"
@@ -188,16 +289,7 @@ Then use the book_flight tool to complete their booking. If they also need hotel
 
 class HotelBookingAgent(Agent):
     def __init__(self, chat_ctx: ChatContext  | None = None) -> None:
-        super().__init__(instructions="""You are a helpful hotel booking AI assistant. You can help users book hotels for their travel.
-        
-When a user wants to book a hotel, ask them for:
-1. City/location where they need the hotel
-2. Check-in date
-3. Check-out date
-4. Number of guests
-5. Room preferences (optional)
-
-Then use the book_hotel tool to complete their booking. Be friendly, professional, and helpful.""",  chat_ctx=chat_ctx if chat_ctx else NOT_GIVEN)
+        super().__init__(instructions=_HOTEL_INSTRUCTIONS, chat_ctx=chat_ctx if chat_ctx else NOT_GIVEN)
     
     def extract_flight_context(self) -> str:
         """Extract flight booking context from chat history and return formatted context info."""
@@ -208,37 +300,43 @@ Then use the book_hotel tool to complete their booking. Be friendly, professiona
             return context_info
             
         # Try to access messages if available
-        if hasattr(self.chat_ctx, 'items'):
-            print(f"📝 Number of messages: {len(self.chat_ctx.items)}")
-            for i, item in enumerate(self.chat_ctx.items):
-                if hasattr(item, 'role'):
-                    print(f"  {item.role}: {item.content}")
-                    
-                    # Extract flight booking information from the conversation
-                    if item.role == "user" and item.content:
-                        content = str(item.content).lower()
-                        # Look for flight booking details
-                        if "flight" in content or "book" in content:
-                            # Extract destination city
-                            if "to " in content:
-                                parts = content.split("to ")
-                                if len(parts) > 1:
-                                    destination = parts[1].split()[0]  # First word after "to"
-                                    flight_details["destination"] = destination.title()
-                            
-                            # Extract date information
-                            if any(word in content for word in ["tomorrow", "today", "next week", "january", "february", "march", "april", "may", "june", "july", "august", "september", "october", "november", "december"]):
-                                for word in ["tomorrow", "today", "next week", "january", "february", "march", "april", "may", "june", "july", "august", "september", "october", "november", "december"]:
-                                    if word in content:
-                                        flight_details["date"] = word.title()
-                                        break
-                    
-                    # Extract flight booking confirmation
-                    if item.role == "assistant" and "flight" in str(item.content).lower() and "booked" in str(item.content).lower():
-                        flight_details["confirmed"] = True
-                        
-        elif hasattr(self.chat_ctx, '__len__'):
-            print(f"📝 Number of items: {len(self.chat_ctx.items)}")
+        try:
+            items = self.chat_ctx.items
+        except AttributeError:
+            return context_info
+        
+        # Walk newest first so the latest destination/date wins, and stop once
+        # destination, date and booking confirmation are all known
+        for item in reversed(items):
+            if hasattr(item, 'role'):
+                content = str(item.content).lower()
+                
+                # Extract flight booking information from the conversation
+                if item.role == "user" and item.content:
+                    # Look for flight booking details
+                    if "flight" in content or "book" in content:
+                        # Extract destination city and date in a single pass
+                        destination = travel_date = None
+                        for match in _CTX_RE.finditer(content):
+                            if match.group(1):
+                                destination = destination or match.group(1)
+                            else:
+                                travel_date = travel_date or match.group(2)
+                            if destination and travel_date:
+                                break
+                        if destination:
+                            flight_details.setdefault("destination", destination.title())
+                        if travel_date:
+                            flight_details.setdefault("date", travel_date.title())
+                
+                # Extract flight booking confirmation
+                if item.role == "assistant" and "flight" in content and "booked" in content:
+                    flight_details["confirmed"] = True
+                
+                if len(flight_details) == 3:
+                    break
+        
+        logger.debug("📝 Extracted %s from %d chat items", flight_details, len(items))
         
         # Build context information for hotel booking
         if flight_details:
@@ -287,32 +385,36 @@ Based on this information, suggest a hotel in the same destination city and arou
         
         # Generate room number
         room_number = f"{random.randint(1, 20)}{random.choice(['A', 'B', 'C', 'D'])}"
+        location = city.upper()
+        room_type_title = room_type.title()
         
-        # Print booking details to console
-        print(f"🏨 HOTEL BOOKING CONFIRMED!")
-        print(f"   Hotel: {hotel_name}")
-        print(f"   Location: {city.upper()}")
-        print(f"   Check-in: {check_in_date}")
-        print(f"   Check-out: {check_out_date}")
-        print(f"   Guests: {guests}")
-        print(f"   Room Type: {room_type.title()}")
-        print(f"   Room Number: {room_number}")
-        print(f"   Nights: {nights}")
-        print(f"   Price per night: ${price_per_night}")
-        print(f"   Total Price: ${total_price}")
-        print(f"   Confirmation: {confirmation_number}")
-        print(f"   Status: CONFIRMED ✅")
-        print("-" * 50)
+        # Log booking details when debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("\n".join([
+                "🏨 HOTEL BOOKING CONFIRMED!",
+                f"   Hotel: {hotel_name}",
+                f"   Location: {location}",
+                f"   Check-in: {check_in_date}",
+                f"   Check-out: {check_out_date}",
+                f"   Guests: {guests}",
+                f"   Room Type: {room_type_title}",
+                f"   Room Number: {room_number}",
+                f"   Nights: {nights}",
+                f"   Price per night: ${price_per_night}",
+                f"   Total Price: ${total_price}",
+                f"   Confirmation: {confirmation_number}",
+                "   Status: CONFIRMED ✅",
+            ]))
         
         # Return structured data
         return {
             "status": "confirmed",
             "hotel_name": hotel_name,
-            "location": city.upper(),
+            "location": location,
             "check_in_date": check_in_date,
             "check_out_date": check_out_date,
             "guests": guests,
-            "room_type": room_type.title(),
+            "room_type": room_type_title,
             "room_number": room_number,
             "nights": nights,
             "price_per_night": f"${price_per_night}",
@@ -323,14 +425,13 @@ Based on this information, suggest a hotel in the same destination city and arou
     
     async def on_enter(self):
         """Agent becomes active - greet the user"""
-        # Print the received chat context
-        print("🏨 HOTEL BOOKING AGENT ACTIVATED")
-        print(f"📋 Received Chat Context: {self.chat_ctx}")
+        # Extract flight context off the event loop so a long chat history doesn't block it
+        context_future = asyncio.get_running_loop().run_in_executor(None, self.extract_flight_context)
         
-        # Extract flight context using the dedicated function
-        context_info = self.extract_flight_context()
+        # Log the received chat context
+        logger.debug("🏨 HOTEL BOOKING AGENT ACTIVATED\n📋 Received Chat Context: %s", self.chat_ctx)
         
-        print("-" * 50)
+        context_info = await context_future
         
         await self.session.generate_reply(
             instructions=f"""Greet the user and ask for their hotel booking details which are not provided in the context:
@@ -345,14 +446,23 @@ Be friendly and helpful in collecting this information. If the user has already
             instructions="Say a friendly goodbye and thank the user for their hotel booking.")
 
 
-async def entrypoint(ctx: agents.JobContext):
-    session = AgentSession(
-        llm=google.realtime.RealtimeModel(
+_LLM: google.realtime.RealtimeModel | None = None
+
+
+def _get_llm() -> google.realtime.RealtimeModel:
+    """Return the realtime model shared by every session in this worker."""
+    global _LLM
+    if _LLM is None:
+        _LLM = google.realtime.RealtimeModel(
             model="gemini-2.5-flash-native-audio-preview-09-2025",
             voice="Aoede",
             _gemini_tools=[types.GoogleSearch()],
         )
-    )
+    return _LLM
+
+
+async def entrypoint(ctx: agents.JobContext):
+    session = AgentSession(llm=_get_llm())
 
     initial_ctx = ChatContext()
     initial_ctx.add_message(role="assistant", content=f"The user's name is Aankit Roy.")